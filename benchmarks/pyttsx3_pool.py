@@ -0,0 +1,62 @@
+import os
+import sys
+import glob
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LINES = 300
+SPEAKERS = ["Bonnie", "Clyde", "Alice", "Bob"]
+PREFIX = "bench_"
+
+
+def build_script():
+    return [
+        (SPEAKERS[i % len(SPEAKERS)], f"This is line {i + 1} of the benchmark script, read aloud by a local voice.")
+        for i in range(LINES)
+    ]
+
+
+def cleanup():
+    # Only the benchmark's own chunks, never a real episode's
+    for f in glob.glob(f"podcast/chunks/{PREFIX}*.wav"):
+        os.remove(f)
+
+
+def run(render):
+    cleanup()
+    start = time.perf_counter()
+    chunk_files = render()
+    elapsed = time.perf_counter() - start
+    cleanup()
+    return elapsed, len(chunk_files)
+
+
+def report(label, elapsed, rendered, baseline):
+    print(
+        f"{label:>22}: {elapsed:7.1f}s  "
+        f"{rendered / elapsed:6.1f} lines/s  speedup x{baseline / elapsed:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    # Imported here, like in main.py, so spawned workers stay lightweight
+    from features.podcast import PodcastGenerator
+
+    dialogues = build_script()
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    print(f"Rendering {LINES} lines with pyttsx3 ({cores} cores)")
+
+    # The 1-worker pool is the baseline, so the speedup shows core scaling only
+    baseline = None
+    for workers in counts:
+        pg = PodcastGenerator("pyttsx3", log_func=lambda m: None, pyttsx3_workers=workers)
+        elapsed, rendered = run(lambda: pg.render_pyttsx3_parallel(dialogues, prefix=PREFIX))
+        baseline = baseline or elapsed
+        report(f"pool, {workers} worker(s)", elapsed, rendered, baseline)
+
+    # Old path for reference: a fresh engine and voice scan per line
+    pg = PodcastGenerator("pyttsx3", log_func=lambda m: None, pyttsx3_workers=1)
+    elapsed, rendered = run(lambda: pg.render_chunks(dialogues, prefix=PREFIX))
+    report("sequential (legacy)", elapsed, rendered, baseline)
@@ -0,0 +1,38 @@
+# Long scripts are split into chapters of roughly this many lines, each
+# assembled and encoded in its own process
+CHAPTER_LINES = 40
+
+
+def split_into_chapters(dialogues, lines_per_chapter=CHAPTER_LINES):
+    chapters = []
+    current = []
+    for speaker, line in dialogues:
+        # Prefer breaking on a change of speaker so no one is cut off mid-turn
+        if len(current) >= lines_per_chapter and (
+            speaker != current[-1][0] or len(current) >= 2 * lines_per_chapter
+        ):
+            chapters.append(current)
+            current = []
+        current.append((speaker, line))
+    if current:
+        chapters.append(current)
+
+    if len(chapters) > 1 and len(chapters[-1]) < lines_per_chapter // 2:
+        chapters[-2].extend(chapters.pop())
+    return chapters
+
+
+def build_ffmetadata(chapters):
+    # ffmpeg writes ffmetadata chapters as ID3 CHAP frames plus a CTOC
+    meta = [";FFMETADATA1"]
+    start = 0
+    for c in chapters:
+        meta += [
+            "[CHAPTER]",
+            "TIMEBASE=1/1000",
+            f"START={start}",
+            f"END={start + c['duration_ms']}",
+            f"title={c['title']}",
+        ]
+        start += c["duration_ms"]
+    return "\n".join(meta) + "\n"
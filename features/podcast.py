@@ -1,11 +1,15 @@
 import os
 import glob
+import json
+import wave
+import subprocess
 import fitz
 import pyttsx3
 import requests
 import wikipediaapi
 from urllib.parse import unquote
 from pydub import AudioSegment
+from pydub.utils import mediainfo
 from dotenv import load_dotenv
 import google.generativeai as genai
 from google.cloud import texttospeech
@@ -13,16 +17,53 @@ from elevenlabs.client import ElevenLabs
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 import re
+import time
 import openai
 import pathlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from features.source_compressor import SourceCompressor, estimate_tokens
+from features.chapters import split_into_chapters, build_ffmetadata
+from features import pyttsx3_worker
 
 load_dotenv()
 
+# Chunks are kept as 16-bit mono PCM WAV at one rate so they can be joined
+# without decoding; only the finished episode is encoded to MP3.
+PCM_SAMPLE_RATE = 24000
+PCM_SAMPLE_WIDTH = 2
+PCM_CHANNELS = 1
+
+# The source sent to the manuscript LLM is trimmed to roughly this many
+# tokens per target word of dialogue, but never below the floor
+SOURCE_TOKENS_PER_WORD = 4
+MIN_SOURCE_TOKENS = 2000
+
+# Assumed (not measured) prompt processing rate of the hosted models, used
+# only to estimate the latency saved by a smaller prompt
+PROMPT_TOKENS_PER_SECOND = 2500
+
+# Starting a pyttsx3 worker costs a process spawn and an engine init, so
+# each one should have at least this many lines to render
+PYTTSX3_LINES_PER_WORKER = 25
+
 class PodcastGenerator:
-    def __init__(self, provider="pyttsx3", log_func=print, manuscript_creator="OpenAI GPT-4"):
+    def __init__(
+        self,
+        provider="pyttsx3",
+        log_func=print,
+        manuscript_creator="OpenAI GPT-4",
+        compress_source=True,
+        source_tokens_per_word=SOURCE_TOKENS_PER_WORD,
+        pyttsx3_workers=None,
+    ):
         self.provider = provider
         self.log = log_func
         self.manuscript_creator = manuscript_creator
+        self.compress_source = compress_source
+        self.source_tokens_per_word = source_tokens_per_word
+        self.compressor = SourceCompressor()
+        self.pyttsx3_workers = pyttsx3_workers or os.cpu_count() or 1
         os.makedirs("podcast/chunks", exist_ok=True)
         os.makedirs("podcast", exist_ok=True)
 
@@ -53,10 +94,23 @@ class PodcastGenerator:
             },
         }
 
-    def summarize_and_format_dialogue(self, text, speakers, target_words):
+    def summarize_and_format_dialogue(self, text, speakers, target_words, source_type=None):
         if not text.strip():
             raise RuntimeError("Empty text")
 
+        raw_tokens = estimate_tokens(text)
+        compress_seconds = 0.0
+        if self.compress_source:
+            budget = max(MIN_SOURCE_TOKENS, int(target_words * self.source_tokens_per_word))
+            text, stats = self.compressor.compress(text, budget, is_transcript=source_type == "YouTube")
+            self.log(
+                f"🗜 Source compressed: ~{stats['tokens_before']} → ~{stats['tokens_after']} tokens "
+                f"(~{stats['tokens_saved']} saved) in {stats['seconds']:.2f}s"
+            )
+            if not text.strip():
+                raise RuntimeError("Empty text")
+            compress_seconds = stats["seconds"]
+
         speaker_list = ", ".join(speakers)
 
         base_prompt = f"""
@@ -64,7 +118,7 @@ You are tasked with creating an engaging, informative dialogue script for a podc
 The dialogue is strictly between {speaker_list}, which are: Bonnie, Clyde, Alice, and Bob.
 Do NOT introduce any other speakers, section headers, titles, or extra text.
 
-Your goal is to clearly and fully convey all relevant information from the source document {text}, 
+Your goal is to clearly and fully convey all relevant information from the source document below, 
 ensuring that someone reading or listening can learn everything important for onboarding or understanding the topic.
 
 Requirements:
@@ -88,6 +142,16 @@ Source Document:
 {text}
 """
 
+        # The previous template interpolated the raw source twice
+        prompt_tokens = estimate_tokens(base_prompt)
+        old_prompt_tokens = prompt_tokens - estimate_tokens(text) + 2 * raw_tokens
+        prompt_saved = old_prompt_tokens - prompt_tokens
+        self.log(
+            f"📉 Prompt: ~{old_prompt_tokens} → ~{prompt_tokens} tokens (~{prompt_saved} saved: "
+            f"~{raw_tokens - estimate_tokens(text)} by compression, ~{raw_tokens} by sending the source once)"
+        )
+
+        started = time.perf_counter()
         if self.manuscript_creator.startswith("OpenAI"):
             resp = openai.chat.completions.create(
                 model="gpt-3.5-turbo",
@@ -103,6 +167,13 @@ Source Document:
         else:
             raise RuntimeError("Invalid manuscript creator")
 
+        est_saved = prompt_saved / PROMPT_TOKENS_PER_SECOND - compress_seconds
+        self.log(
+            f"⏱ Manuscript generated in {time.perf_counter() - started:.1f}s; "
+            f"est. net latency saved ~{est_saved:.1f}s "
+            f"(assuming {PROMPT_TOKENS_PER_SECOND} prompt tokens/s, minus {compress_seconds:.2f}s compression)"
+        )
+
         return self.create_dialogue(dialogue_text)
 
 
@@ -129,7 +200,7 @@ Source Document:
 
 
     def cleanup_chunks(self):
-        for f in glob.glob("podcast/chunks/*.mp3"):
+        for f in glob.glob("podcast/chunks/*.mp3") + glob.glob("podcast/chunks/*.wav"):
             try:
                 os.remove(f)
             except:
@@ -144,7 +215,14 @@ Source Document:
         return page.summary
 
     def extract_text_from_pdf(self, path):
-        return "".join(page.get_text() for page in fitz.open(path))
+        # One paragraph per text block, so duplicate passages and page
+        # furniture can be told apart from the body text
+        return "\n\n".join(
+            block[4].strip()
+            for page in fitz.open(path)
+            for block in page.get_text("blocks")
+            if block[6] == 0 and block[4].strip()
+        )
 
     def extract_text_from_txt(self, path):
         with open(path, "r", encoding="utf-8") as f:
@@ -162,32 +240,45 @@ Source Document:
     def hf_generate(self, prompt):
         raise NotImplementedError()
 
+    def write_pcm_wav(self, filename, pcm, sample_rate=PCM_SAMPLE_RATE):
+        with wave.open(filename, "wb") as w:
+            w.setnchannels(PCM_CHANNELS)
+            w.setsampwidth(PCM_SAMPLE_WIDTH)
+            w.setframerate(sample_rate)
+            w.writeframes(pcm)
+
     def text_to_speech(self, text, speaker_name, filename):
         if self.provider == "google":
             voice_id = self.voice_map[speaker_name]["google"]
             inp = texttospeech.SynthesisInput(text=text)
             voice = texttospeech.VoiceSelectionParams(language_code="en-US", name=voice_id)
-            config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+            config = texttospeech.AudioConfig(
+                audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+                sample_rate_hertz=PCM_SAMPLE_RATE,
+            )
             audio = self.gcp_client.synthesize_speech(inp, voice, config)
             with open(filename, "wb") as f:
                 f.write(audio.audio_content)
         elif self.provider == "elevenlabs":
             voice_id = self.voice_map[speaker_name]["elevenlabs"]
-            stream = self.eleven_client.text_to_speech.convert(text=text, voice_id=voice_id, model_id="eleven_multilingual_v2")
-            with open(filename, "wb") as f:
-                for chunk in stream:
-                    f.write(chunk)
+            stream = self.eleven_client.text_to_speech.convert(
+                text=text,
+                voice_id=voice_id,
+                model_id="eleven_multilingual_v2",
+                output_format=f"pcm_{PCM_SAMPLE_RATE}",
+            )
+            self.write_pcm_wav(filename, b"".join(stream))
         elif self.provider == "openai":
             voice_id = self.voice_map[speaker_name]["openai"]
             r = requests.post(
                 "https://api.openai.com/v1/audio/speech",
                 headers={"Authorization": f"Bearer {openai.api_key}", "Content-Type": "application/json"},
-                json={"model": "gpt-4o-mini-tts", "input": text, "voice": voice_id, "response_format": "mp3"},
+                json={"model": "gpt-4o-mini-tts", "input": text, "voice": voice_id, "response_format": "pcm"},
             )
             if r.status_code != 200:
                 raise RuntimeError("OpenAI TTS error")
-            with open(filename, "wb") as f:
-                f.write(r.content)
+            # "pcm" is raw 24 kHz 16-bit mono without a header
+            self.write_pcm_wav(filename, r.content)
         elif self.provider == "pyttsx3":
             engine = pyttsx3.init()
             voices = engine.getProperty("voices")
@@ -195,14 +286,51 @@ Source Document:
             v = next((x for x in voices if target in x.name.lower()), None)
             if v:
                 engine.setProperty("voice", v.id)
-            wav = filename.replace(".mp3", ".wav")
-            engine.save_to_file(text, wav)
+            engine.save_to_file(text, filename)
             engine.runAndWait()
-            AudioSegment.from_wav(wav).export(filename, format="mp3")
-            os.remove(wav)
         else:
             raise RuntimeError("Invalid provider")
 
+    @staticmethod
+    def read_pcm_frames(filename):
+        try:
+            with wave.open(filename, "rb") as w:
+                params = (w.getnchannels(), w.getsampwidth(), w.getframerate())
+                frames = w.readframes(w.getnframes())
+        except (wave.Error, EOFError):
+            # e.g. WAVE_FORMAT_EXTENSIBLE from some SAPI voices
+            seg = AudioSegment.from_file(filename)
+            params = (seg.channels, seg.sample_width, seg.frame_rate)
+            frames = seg.raw_data
+        if params != (PCM_CHANNELS, PCM_SAMPLE_WIDTH, PCM_SAMPLE_RATE):
+            seg = AudioSegment(data=frames, channels=params[0], sample_width=params[1], frame_rate=params[2])
+            seg = seg.set_channels(PCM_CHANNELS).set_sample_width(PCM_SAMPLE_WIDTH).set_frame_rate(PCM_SAMPLE_RATE)
+            frames = seg.raw_data
+        return frames
+
+    @staticmethod
+    def combine_chunks(chunk_files):
+        # Chunks share one PCM layout, so joining is a byte concatenation
+        # instead of decoding and re-appending AudioSegments one at a time.
+        data = b"".join(PodcastGenerator.read_pcm_frames(c) for c in chunk_files)
+        return AudioSegment(
+            data=data,
+            channels=PCM_CHANNELS,
+            sample_width=PCM_SAMPLE_WIDTH,
+            frame_rate=PCM_SAMPLE_RATE,
+        )
+
+    @staticmethod
+    def overlay_music(podcast, music_path, offset_ms=0, volume_reduction_db=20):
+        music = AudioSegment.from_mp3(music_path) - volume_reduction_db
+
+        # Start where the previous chapter left off so the loop stays continuous
+        start = offset_ms % len(music)
+        loops = ((start + len(podcast)) // len(music)) + 1
+        looped = (music * loops)[start:start + len(podcast)]
+
+        return podcast.overlay(looped)
+
     def download_mp3(self, url, filename):
         with requests.get(url, stream=True) as r:
             r.raise_for_status()
@@ -231,28 +359,155 @@ Source Document:
         except:
             return None
 
-    def mix_background_music(self, podcast_path, background_music=True, volume_reduction_db=20):
-        if not background_music:
-            return
-
+    def download_background_music(self, filename):
         url = None
         for tag in ["lofi", "chill", "instrumental"]:
             url = self.fetch_jamendo_track(tag)
             if url:
                 break
         if not url:
-            return
+            return None
+        return self.download_mp3(url, filename)
 
-        bg = self.download_mp3(url, "podcast/bgmusic.mp3")
-        podcast = AudioSegment.from_mp3(podcast_path)
-        music = AudioSegment.from_mp3(bg) - volume_reduction_db
+    def render_chunks(self, dialogues, stop_callback=None, progress_callback=None, prefix=""):
+        workers = min(self.pyttsx3_workers, len(dialogues) // PYTTSX3_LINES_PER_WORKER)
+        if self.provider == "pyttsx3" and workers > 1:
+            return self.render_pyttsx3_parallel(dialogues, stop_callback, progress_callback, prefix, workers)
 
-        loops = (len(podcast) // len(music)) + 1
-        looped = (music * loops)[:len(podcast)]
+        chunk_files = []
+        total = len(dialogues)
+
+        for i, (speaker, line) in enumerate(dialogues):
+            if stop_callback and stop_callback():
+                return None
+            filename = f"podcast/chunks/{prefix}{i}.wav"
+            self.text_to_speech(line, speaker, filename)
+            chunk_files.append(filename)
+            if progress_callback:
+                progress_callback(i + 1, total)
 
-        mixed = podcast.overlay(looped)
-        mixed.export(podcast_path, format="mp3")
-        os.remove(bg)
+        return chunk_files
+
+    def render_pyttsx3_parallel(self, dialogues, stop_callback=None, progress_callback=None, prefix="", workers=None):
+        # pyttsx3 engines are not thread-safe, so each worker process owns one
+        # engine with the speakers' voices resolved once at startup
+        voice_names = {speaker: voices["pyttsx3"] for speaker, voices in self.voice_map.items()}
+        jobs = [
+            (line, speaker, f"podcast/chunks/{prefix}{i}.wav")
+            for i, (speaker, line) in enumerate(dialogues)
+        ]
+        total = len(jobs)
+        workers = min(workers or self.pyttsx3_workers, total)
+
+        chunk_files = []
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers, initializer=pyttsx3_worker.init_worker, initargs=(voice_names,)) as pool:
+            # imap hands results back in script order as soon as each is ready
+            for filename in pool.imap(pyttsx3_worker.render_line, jobs):
+                if stop_callback and stop_callback():
+                    return None
+                chunk_files.append(filename)
+                if progress_callback:
+                    progress_callback(len(chunk_files), total)
+
+        return chunk_files
+
+    def encode_chapters(self, chapters, chunk_files, chapter_dir, output_path, bg_path=None):
+        os.makedirs(chapter_dir, exist_ok=True)
+
+        jobs = []
+        manifest = {"output": output_path, "background_music": bg_path, "chapters": []}
+        offset_ms = 0
+        start = 0
+        for n, lines in enumerate(chapters):
+            files = chunk_files[start:start + len(lines)]
+            start += len(lines)
+
+            script = os.path.join(chapter_dir, f"chapter_{n + 1}.txt")
+            with open(script, "w", encoding="utf-8") as f:
+                f.write("\n".join(f"{speaker}: {text}" for speaker, text in lines))
+
+            audio = os.path.join(chapter_dir, f"chapter_{n + 1}.mp3")
+            jobs.append((files, audio, bg_path, offset_ms))
+            manifest["chapters"].append(
+                {"title": f"Chapter {n + 1}", "script": script, "file": audio, "offset_ms": offset_ms}
+            )
+            offset_ms += sum(self.chunk_duration_ms(c) for c in files)
+
+        self.log(f"🎚 Encoding {len(jobs)} chapters...")
+        workers = min(len(jobs), os.cpu_count() or 1)
+        # spawn, not fork: this runs from the GUI's QThread and forking a
+        # multithreaded Qt process can deadlock the children
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            durations = list(pool.map(encode_chapter, *zip(*jobs)))
+
+        for chapter, duration in zip(manifest["chapters"], durations):
+            chapter["duration_ms"] = duration
+        with open(os.path.join(chapter_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        self.join_chapters(manifest["chapters"], output_path)
+
+    def chunk_duration_ms(self, filename):
+        try:
+            with wave.open(filename, "rb") as w:
+                return int(w.getnframes() * 1000 / w.getframerate())
+        except (wave.Error, EOFError):
+            return len(AudioSegment.from_file(filename))
+
+    def join_chapters(self, chapters, output_path):
+        chapter_dir = os.path.dirname(chapters[0]["file"])
+        list_path = os.path.join(chapter_dir, "concat.txt")
+        meta_path = os.path.join(chapter_dir, "chapters.txt")
+
+        with open(list_path, "w", encoding="utf-8") as f:
+            for c in chapters:
+                path = os.path.abspath(c["file"]).replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+
+        with open(meta_path, "w", encoding="utf-8") as f:
+            f.write(build_ffmetadata(chapters))
+
+        cmd = [
+            AudioSegment.converter, "-y",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", meta_path,
+            "-map", "0:a", "-map_metadata", "1", "-map_chapters", "1",
+            "-c", "copy", "-id3v2_version", "3",
+            output_path,
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to join chapters: {result.stderr.strip()}")
+
+    def rerender_chapter(self, chapter_dir, number):
+        with open(os.path.join(chapter_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        chapters = manifest["chapters"]
+        if not 1 <= number <= len(chapters):
+            raise ValueError(f"Chapter {number} does not exist")
+        chapter = chapters[number - 1]
+
+        with open(chapter["script"], "r", encoding="utf-8") as f:
+            dialogues = self.create_dialogue(f.read())
+
+        os.makedirs("podcast/chunks", exist_ok=True)
+        chunk_files = self.render_chunks(dialogues, prefix=f"chapter{number}_")
+        # The PCM offset from the original encode keeps the music loop in step
+        offset_ms = chapter["offset_ms"]
+        bg_path = manifest["background_music"]
+        if bg_path and not os.path.exists(bg_path):
+            bg_path = None
+        chapter["duration_ms"] = encode_chapter(chunk_files, chapter["file"], bg_path, offset_ms)
+        for c in chunk_files:
+            os.remove(c)
+
+        with open(os.path.join(chapter_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        self.join_chapters(chapters, manifest["output"])
+        self.log(f"✅ Re-rendered {chapter['title']}: {manifest['output']}")
 
     def generate_podcast(
         self,
@@ -279,25 +534,13 @@ Source Document:
         else:
             raise RuntimeError("Invalid source type")
 
-        dialogues = self.summarize_and_format_dialogue(text, speakers, target_length)
+        dialogues = self.summarize_and_format_dialogue(text, speakers, target_length, source_type)
         self.cleanup_chunks()
 
-        chunk_files = []
-        total = len(dialogues)
-
-        for i, (speaker, line) in enumerate(dialogues):
-            if stop_callback and stop_callback():
-                self.stopped_early = True
-                return
-            filename = f"podcast/chunks/{i}.mp3"
-            self.text_to_speech(line, speaker, filename)
-            chunk_files.append(filename)
-            if progress_callback:
-                progress_callback(i + 1, total)
-
-        combined = AudioSegment.empty()
-        for c in chunk_files:
-            combined += AudioSegment.from_mp3(c)
+        chunk_files = self.render_chunks(dialogues, stop_callback, progress_callback)
+        if chunk_files is None:
+            self.stopped_early = True
+            return
 
         base = pathlib.Path(source).stem if source_type != "Wikipedia" else "wikipedia_podcast"
         output_path = f"podcast/{base}.mp3"
@@ -306,9 +549,34 @@ Source Document:
             output_path = f"podcast/{base}({counter}).mp3"
             counter += 1
 
-        combined.export(output_path, format="mp3")
-
-        if background_music:
-            self.mix_background_music(output_path, background_music=True)
+        chapters = split_into_chapters(dialogues)
+        if len(chapters) == 1:
+            # Short episodes are encoded straight to the output, no chapter copy is kept
+            bg_path = None
+            if background_music:
+                bg_path = self.download_background_music("podcast/bgmusic.mp3")
+            encode_chapter(chunk_files, output_path, bg_path, measure=False)
+            if bg_path:
+                os.remove(bg_path)
+        else:
+            chapter_dir = f"podcast/chapters/{pathlib.Path(output_path).stem}"
+            os.makedirs(chapter_dir, exist_ok=True)
+            bg_path = None
+            if background_music:
+                bg_path = self.download_background_music(os.path.join(chapter_dir, "bgmusic.mp3"))
+            self.encode_chapters(chapters, chunk_files, chapter_dir, output_path, bg_path)
 
         self.log(f"✅ Podcast ready: {output_path}")
+
+
+def encode_chapter(chunk_files, out_path, bg_path=None, offset_ms=0, measure=True):
+    # Runs in a worker process: assemble one chapter's PCM chunks and encode it
+    chapter = PodcastGenerator.combine_chunks(chunk_files)
+    if bg_path:
+        chapter = PodcastGenerator.overlay_music(chapter, bg_path, offset_ms)
+    chapter.export(out_path, format="mp3")
+    if not measure:
+        return None
+    # Chapter markers use the encoded length, which includes the encoder
+    # delay and padding that stream-copy joining keeps at each boundary
+    return int(float(mediainfo(out_path)["duration"]) * 1000)
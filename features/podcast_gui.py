@@ -205,7 +205,7 @@ class PodcastGeneratorUI(QWidget):
             self.log(f"❌ Failed to extract content: {e}")
             return
 
-        dialogues = pg.summarize_and_format_dialogue(content_text, speakers, target_length)
+        dialogues = pg.summarize_and_format_dialogue(content_text, speakers, target_length, source_type)
         manus = "\n".join(f"{speaker}: {text}" for speaker, text in dialogues)
 
         dialog = ManuscriptReviewDialog(manus)
@@ -0,0 +1,27 @@
+# Entry points for the pyttsx3 worker processes. Kept apart from
+# features.podcast so spawned workers only import pyttsx3, not the
+# LLM, cloud TTS and PDF libraries.
+import pyttsx3
+
+_engine = None
+_voice_ids = {}
+
+
+def init_worker(voice_names):
+    global _engine
+    _engine = pyttsx3.init()
+    voices = _engine.getProperty("voices")
+    # Speakers whose voice isn't installed get the engine default every time,
+    # not whatever voice this worker used for its previous line
+    default = _engine.getProperty("voice")
+    for speaker, name in voice_names.items():
+        v = next((x for x in voices if name.lower() in x.name.lower()), None)
+        _voice_ids[speaker] = v.id if v else default
+
+
+def render_line(job):
+    text, speaker, filename = job
+    _engine.setProperty("voice", _voice_ids[speaker])
+    _engine.save_to_file(text, filename)
+    _engine.runAndWait()
+    return filename
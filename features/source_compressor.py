@@ -0,0 +1,236 @@
+import re
+import math
+import time
+from collections import Counter
+
+# Rough OpenAI/Gemini average for English prose
+CHARS_PER_TOKEN = 4
+
+STOPWORDS = set("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves also one two may might must shall us
+""".split())
+
+BOILERPLATE_LINE_PATTERNS = [
+    re.compile(r"\.{4,}\s*\d+\s*$"),  # table of contents dot leaders
+    re.compile(r"^\s*(table of )?contents\s*$", re.I),
+    re.compile(r"^\s*page\s*\d+(\s*(of|/)\s*\d+)?\s*$", re.I),
+    re.compile(r"^\s*(copyright\s*)?(©|\(c\))\s*\d{4}", re.I),
+    re.compile(r"^\s*(copyright|©|\(c\)).*all rights reserved", re.I),
+    re.compile(r"^\s*(https?://|www\.)\S+\s*$", re.I),
+]
+
+# A bare number is only a page number when it stands alone as its own block;
+# inside a hard-wrapped paragraph it may be a year or a figure
+BARE_NUMBER_PATTERN = re.compile(r"^\d{1,4}(\s*(of|/)\s*\d{1,4})?$", re.I)
+
+# Only applied to transcripts; in prose these can be real words ("UM campus", "uh-oh")
+CUE_PATTERN = re.compile(r"\[(music|applause|laughter|inaudible|silence)\]\s*", re.I)
+FILLER_PATTERN = re.compile(r"(?<![\w-])(um+|uh+|erm+|hmm+)(?![\w-]),?\s*", re.I)
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+WORD_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9'-]+")
+
+# Transcripts often have no punctuation, so long runs are cut into windows
+MAX_SENTENCE_WORDS = 60
+
+# Text without blank lines (transcripts, some PDFs) is regrouped into
+# windows of about this many words so near-duplicate passages can be found
+PARAGRAPH_WINDOW_WORDS = 80
+
+# TextRank is quadratic in sentence count; above this sentences are scored
+# by similarity to the document centroid instead
+MAX_TEXTRANK_SENTENCES = 1500
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class SourceCompressor:
+    def __init__(self, duplicate_threshold=0.8, repeated_line_count=3):
+        self.duplicate_threshold = duplicate_threshold
+        self.repeated_line_count = repeated_line_count
+
+    def compress(self, text, token_budget, is_transcript=False):
+        start = time.perf_counter()
+        tokens_before = estimate_tokens(text)
+
+        stripped = self.strip_boilerplate(text, is_transcript)
+        paragraphs = self.dedup_paragraphs(self.split_paragraphs(stripped))
+        cleaned = "\n\n".join(paragraphs)
+        if estimate_tokens(cleaned) > token_budget:
+            cleaned = self.select_sentences(paragraphs, token_budget)
+
+        tokens_after = estimate_tokens(cleaned)
+        stats = {
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": tokens_before - tokens_after,
+            "seconds": time.perf_counter() - start,
+        }
+        return cleaned, stats
+
+    def strip_boilerplate(self, text, is_transcript=False):
+        lines = [line.strip() for line in text.splitlines()]
+
+        # Short lines seen on many pages are running headers and footers
+        counts = Counter(line.lower() for line in lines if line and len(line) < 80)
+        repeated = {line for line, n in counts.items() if n >= self.repeated_line_count}
+
+        kept = []
+        for i, line in enumerate(lines):
+            if line and line.lower() in repeated:
+                continue
+            if any(p.search(line) for p in BOILERPLATE_LINE_PATTERNS):
+                continue
+            if BARE_NUMBER_PATTERN.match(line) and self.is_standalone(lines, i):
+                continue
+            if is_transcript:
+                line = FILLER_PATTERN.sub("", CUE_PATTERN.sub("", line)).strip()
+            kept.append(line)
+        return "\n".join(kept)
+
+    def is_standalone(self, lines, i):
+        before = i == 0 or not lines[i - 1]
+        after = i == len(lines) - 1 or not lines[i + 1]
+        return before and after
+
+    def split_paragraphs(self, text):
+        # PDF extraction hard-wraps lines, so lines inside a paragraph are rejoined
+        paragraphs = []
+        for block in re.split(r"\n\s*\n", text):
+            # Keep the hyphen: "well-\nknown" is a compound as often as a split word
+            joined = re.sub(r"-\n(?=[a-z])", "-", block)
+            words = joined.split()
+            if len(words) > 2 * PARAGRAPH_WINDOW_WORDS:
+                paragraphs += self.window_sentences(" ".join(words))
+            elif words:
+                paragraphs.append(" ".join(words))
+        return paragraphs
+
+    def window_sentences(self, text):
+        windows = []
+        current = []
+        count = 0
+        for s in self.split_sentences(text):
+            current.append(s)
+            count += len(s.split())
+            if count >= PARAGRAPH_WINDOW_WORDS:
+                windows.append(" ".join(current))
+                current = []
+                count = 0
+        if current:
+            windows.append(" ".join(current))
+        return windows
+
+    def shingles(self, paragraph, size=5):
+        words = re.findall(r"\w+", paragraph.lower())
+        if len(words) <= size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def dedup_paragraphs(self, paragraphs):
+        kept = []
+        kept_shingles = []
+        seen = set()
+        for p in paragraphs:
+            key = p.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+
+            sh = self.shingles(p)
+            duplicate = False
+            for other in kept_shingles:
+                overlap = len(sh & other)
+                if overlap and overlap / len(sh | other) >= self.duplicate_threshold:
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append(p)
+                kept_shingles.append(sh)
+        return kept
+
+    def split_sentences(self, paragraph):
+        sentences = []
+        for s in SENTENCE_SPLIT.split(paragraph):
+            words = s.split()
+            for i in range(0, len(words), MAX_SENTENCE_WORDS):
+                sentences.append(" ".join(words[i:i + MAX_SENTENCE_WORDS]))
+        return sentences
+
+    def tfidf_vectors(self, sentences):
+        docs = [[w for w in (t.lower() for t in WORD_PATTERN.findall(s)) if w not in STOPWORDS] for s in sentences]
+        df = Counter(w for doc in docs for w in set(doc))
+        n = len(docs)
+        vectors = []
+        for doc in docs:
+            tf = Counter(doc)
+            vec = {w: (c / len(doc)) * math.log((1 + n) / (1 + df[w])) for w, c in tf.items()}
+            norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+            vectors.append({w: v / norm for w, v in vec.items()})
+        return vectors
+
+    def textrank(self, vectors, damping=0.85, iterations=30):
+        n = len(vectors)
+        neighbours = [[] for _ in range(n)]
+        for i in range(n):
+            for j in range(i + 1, n):
+                a, b = vectors[i], vectors[j]
+                if len(a) > len(b):
+                    a, b = b, a
+                sim = sum(v * b[w] for w, v in a.items() if w in b)
+                if sim > 0:
+                    neighbours[i].append((j, sim))
+                    neighbours[j].append((i, sim))
+
+        out_weight = [sum(s for _, s in nb) or 1.0 for nb in neighbours]
+        scores = [1.0 / n] * n
+        for _ in range(iterations):
+            scores = [
+                (1 - damping) / n + damping * sum(scores[j] * s / out_weight[j] for j, s in neighbours[i])
+                for i in range(n)
+            ]
+        return scores
+
+    def select_sentences(self, paragraphs, token_budget):
+        sentences = []
+        for p_index, p in enumerate(paragraphs):
+            sentences += [(p_index, s) for s in self.split_sentences(p)]
+        if not sentences:
+            return ""
+
+        vectors = self.tfidf_vectors([s for _, s in sentences])
+        if len(sentences) <= MAX_TEXTRANK_SENTENCES:
+            scores = self.textrank(vectors)
+        else:
+            centroid = Counter()
+            for v in vectors:
+                centroid.update(v)
+            scores = [sum(x * centroid[w] for w, x in v.items()) for v in vectors]
+
+        chosen = set()
+        used = 0
+        for i in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+            cost = estimate_tokens(sentences[i][1]) + 1
+            if used + cost > token_budget:
+                continue
+            chosen.add(i)
+            used += cost
+
+        # Keep the original order and paragraph breaks so the LLM sees a readable source
+        out = []
+        current = None
+        for i in sorted(chosen):
+            p_index, s = sentences[i]
+            if p_index != current:
+                out.append([])
+                current = p_index
+            out[-1].append(s)
+        return "\n\n".join(" ".join(p) for p in out)
@@ -1,7 +1,9 @@
-from PySide6.QtWidgets import QApplication
-from features.podcast_gui import PodcastGeneratorUI
-
 if __name__ == "__main__":
+    # Imported here so spawned worker processes, which re-import this
+    # module, don't load Qt and the whole generator
+    from PySide6.QtWidgets import QApplication
+    from features.podcast_gui import PodcastGeneratorUI
+
     app = QApplication([])
     window = PodcastGeneratorUI()
     window.resize(600, 800)
@@ -0,0 +1,47 @@
+from features.chapters import split_into_chapters, build_ffmetadata
+
+
+def script(speakers):
+    return [(speaker, f"line {i}") for i, speaker in enumerate(speakers)]
+
+
+def test_short_script_is_one_chapter():
+    chapters = split_into_chapters(script("AB" * 5), lines_per_chapter=20)
+    assert len(chapters) == 1
+    assert len(chapters[0]) == 10
+
+
+def test_breaks_on_speaker_change_after_limit():
+    # A keeps talking past the limit, so the break waits for B
+    dialogues = script("AAAAAB" + "AB" * 4)
+    chapters = split_into_chapters(dialogues, lines_per_chapter=4)
+    assert [len(c) for c in chapters] == [5, 4, 5]
+    assert chapters[1][0] == ("B", "line 5")
+
+
+def test_monologue_is_capped_at_twice_the_limit():
+    chapters = split_into_chapters(script("A" * 20), lines_per_chapter=4)
+    assert [len(c) for c in chapters] == [8, 8, 4]
+
+
+def test_short_tail_is_merged_into_previous_chapter():
+    chapters = split_into_chapters(script("AB" * 5), lines_per_chapter=8)
+    assert [len(c) for c in chapters] == [10]
+
+
+def test_no_lines_are_lost_or_reordered():
+    dialogues = script("ABCD" * 30)
+    chapters = split_into_chapters(dialogues, lines_per_chapter=7)
+    assert [line for c in chapters for line in c] == dialogues
+
+
+def test_ffmetadata_chapters_are_contiguous():
+    meta = build_ffmetadata([
+        {"title": "Chapter 1", "duration_ms": 1500},
+        {"title": "Chapter 2", "duration_ms": 2500},
+    ])
+    assert meta == (
+        ";FFMETADATA1\n"
+        "[CHAPTER]\nTIMEBASE=1/1000\nSTART=0\nEND=1500\ntitle=Chapter 1\n"
+        "[CHAPTER]\nTIMEBASE=1/1000\nSTART=1500\nEND=4000\ntitle=Chapter 2\n"
+    )
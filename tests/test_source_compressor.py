@@ -0,0 +1,84 @@
+from features.source_compressor import SourceCompressor, estimate_tokens
+
+
+PROSE = "As you know, the UM campus is large. Did you know that uh-oh happens?"
+
+
+def paragraph(topic, n=12):
+    return " ".join(f"The {topic} study reports finding number {i} about {topic} results." for i in range(n))
+
+
+def test_prose_is_left_alone():
+    text, _ = SourceCompressor().compress(PROSE, 2000)
+    assert text == PROSE
+
+
+def test_transcript_filler_and_cues_are_stripped():
+    transcript = "[Music]\num so the model is trained\nuh, then we test it [Applause]\nuh-oh that failed"
+    text, _ = SourceCompressor().compress(transcript, 2000, is_transcript=True)
+    assert text == "so the model is trained then we test it uh-oh that failed"
+
+
+def test_cues_are_kept_outside_transcripts():
+    text, _ = SourceCompressor().compress("Stage direction: [Music] plays softly.", 2000)
+    assert "[Music]" in text
+
+
+def test_boilerplate_lines_are_removed():
+    source = "\n\n".join([
+        "Contents\nIntroduction ........ 3",
+        "Real content about rivers.",
+        "Page 2 of 10",
+        "Copyright © 2024 Example Corp. All rights reserved.",
+        "More content about lakes.",
+    ])
+    text, _ = SourceCompressor().compress(source, 2000)
+    assert text == "Real content about rivers.\n\nMore content about lakes."
+
+
+def test_repeated_running_headers_are_removed():
+    pages = [f"Annual Report 2024\n{paragraph(topic, 2)}" for topic in ["soil", "water", "air"]]
+    text, _ = SourceCompressor().compress("\n\n".join(pages), 2000)
+    assert "Annual Report 2024" not in text
+
+
+def test_near_duplicate_paragraphs_are_dropped():
+    original = paragraph("soil")
+    near_copy = original.replace("number 3", "number three")
+    text, _ = SourceCompressor().compress("\n\n".join([original, paragraph("water"), near_copy]), 5000)
+    assert text.count("soil study reports finding number 5") == 1
+    assert "water" in text
+
+
+def test_near_duplicates_are_found_without_blank_lines():
+    # Transcripts and some PDF text arrive as one long run of lines
+    original = paragraph("soil", 8)
+    source = "\n".join([original, paragraph("water", 8), original])
+    text, _ = SourceCompressor().compress(source, 5000, is_transcript=True)
+    assert text.count("soil study reports finding number 5") == 1
+    assert "water study reports finding number 5" in text
+
+
+def test_output_fits_budget_and_reports_savings():
+    source = "\n\n".join(paragraph(topic) for topic in ["soil", "water", "air", "fire", "ice", "sand"])
+    text, stats = SourceCompressor().compress(source, 300)
+    assert estimate_tokens(text) <= 300
+    assert stats["tokens_after"] == estimate_tokens(text)
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"]
+
+
+def test_body_lines_mentioning_rights_are_kept():
+    source = "The treaty says that all rights reserved by the crown\nwere handed to parliament."
+    text, _ = SourceCompressor().compress(source, 2000)
+    assert "all rights reserved by the crown" in text
+
+
+def test_wrapped_numbers_are_kept_but_standalone_page_numbers_dropped():
+    source = "The bridge opened in\n1932\nafter six years of work.\n\n14\n\nIt is still in use."
+    text, _ = SourceCompressor().compress(source, 2000)
+    assert text == "The bridge opened in 1932 after six years of work.\n\nIt is still in use."
+
+
+def test_hyphenated_line_breaks_keep_the_hyphen():
+    text, _ = SourceCompressor().compress("A well-\nknown result.", 2000)
+    assert text == "A well-known result."